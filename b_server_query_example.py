@@ -8,7 +8,10 @@ B服务器示例代码 - 查询版本
 3. 验证用户支付
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import hmac
 import hashlib
 import time
@@ -18,16 +21,30 @@ from typing import Optional, Dict, List
 class OKXPaymentChecker:
     """OKX支付检查器 - 用于B服务器查询A服务器的转账记录"""
 
-    def __init__(self, api_url: str, api_secret: str):
+    def __init__(self, api_url: str, api_secret: str, alg: str = 'sha256'):
         """
         初始化支付检查器
 
         Args:
             api_url: A服务器查询API地址 (例如: http://192.168.1.100:6000)
             api_secret: 查询API密钥（与A服务器config.json中的query_api.secret一致）
+            alg: 签名算法 sha256 / blake2b（与A服务器config.json中的query_api.alg一致）
         """
         self.api_url = api_url.rstrip('/')
         self.api_secret = api_secret
+        self.alg = alg
+        self._api_secret_bytes = api_secret.encode('utf-8')
+
+        # 预先完成HMAC密钥初始化，每次签名只需copy()
+        self._hmac_template = hmac.new(self._api_secret_bytes, digestmod=hashlib.sha256)
+
+        # 复用到A服务器的HTTP连接（keep-alive）
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def _generate_signature(self, params: dict, timestamp: str) -> str:
         """
@@ -38,7 +55,7 @@ class OKXPaymentChecker:
             timestamp: 请求时间戳
 
         Returns:
-            str: HMAC-SHA256签名
+            str: 十六进制签名
         """
         # 参数按字母排序
         sorted_params = sorted(params.items())
@@ -47,14 +64,16 @@ class OKXPaymentChecker:
         # 生成签名字符串
         sign_str = f"{param_str}&timestamp={timestamp}&secret={self.api_secret}"
 
-        # 计算HMAC-SHA256
-        signature = hmac.new(
-            bytes(self.api_secret, encoding='utf8'),
-            bytes(sign_str, encoding='utf-8'),
-            digestmod=hashlib.sha256
-        ).hexdigest()
+        # 计算签名（默认HMAC-SHA256）
+        if self.alg == 'blake2b':
+            return hashlib.blake2b(
+                sign_str.encode('utf-8'), key=self._api_secret_bytes, digest_size=32
+            ).hexdigest()
+
+        mac = self._hmac_template.copy()
+        mac.update(sign_str.encode('utf-8'))
 
-        return signature
+        return mac.hexdigest()
 
     def query_transfers(self, amount: Optional[float] = None,
                        currency: str = 'USDT',
@@ -99,14 +118,14 @@ class OKXPaymentChecker:
             params['timestamp'] = timestamp
 
             # 发送请求
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_url}/api/query",
                 params=params,
                 timeout=10
             )
 
             if response.status_code == 200:
-                return response.json()
+                return orjson.loads(response.content)
             else:
                 return {
                     'success': False,
@@ -149,14 +168,14 @@ class OKXPaymentChecker:
             params['timestamp'] = timestamp
 
             # 发送请求
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_url}/api/check",
                 params=params,
                 timeout=10
             )
 
             if response.status_code == 200:
-                return response.json()
+                return orjson.loads(response.content)
             else:
                 return {
                     'success': False,
@@ -297,7 +316,7 @@ def verify_payment():
     }
     """
     try:
-        data = request.json
+        data = orjson.loads(request.get_data() or b'null')
 
         if not data or 'amount' not in data:
             return jsonify({
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+查询API的gunicorn配置
+监听地址读取 config.json 中的 query_api.host / query_api.port
+"""
+
+import json
+import multiprocessing
+
+
+def _load_bind() -> str:
+    """从配置文件读取监听地址"""
+    try:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            api_config = json.load(f).get('query_api', {})
+    except Exception:
+        api_config = {}
+
+    return f"{api_config.get('host', '0.0.0.0')}:{api_config.get('port', 6000)}"
+
+
+bind = _load_bind()
+workers = multiprocessing.cpu_count() * 2 + 1
+worker_class = 'gthread'
+threads = 8
+timeout = 30
+
+# 在master进程中加载配置并解析JSON，fork后的worker通过写时复制共享
+preload_app = True
+
+
+def post_fork(server, worker):
+    """每个worker启动自己的日志和文件监听线程（线程不会随fork继承）"""
+    from query_api import setup_logging, start_json_watcher
+    setup_logging()
+    start_json_watcher()
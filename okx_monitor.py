@@ -13,19 +13,57 @@ import base64
 import hashlib
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import json
+import orjson
 import os
+import fcntl
+import threading
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from decimal import Decimal
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict
+from typing import List, Dict, Set
 
 # 禁用SSL警告
 import urllib3
+from urllib3.util.retry import Retry
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+logger = logging.getLogger('okx_monitor')
+
+
+def setup_logging():
+    """配置日志：调用方只把日志放入队列，由后台线程写入stdout"""
+    log_queue = queue.SimpleQueue()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
 
 class OKXMonitor:
     """OKX转账监控器"""
 
+    # 账单查询路径（固定参数，无需每次拼接）
+    BILLS_PATH = '/api/v5/account/bills?instType=&type=1'
+
+    # 整数金额的精度（1e-8），amount_u8 = amount × 10^8
+    AMOUNT_SCALE = 10 ** 8
+
+    # 私有WebSocket频道（账户余额变动推送）
+    WS_PRIVATE_URL = 'wss://ws.okx.com:8443/ws/v5/private'
+
     def __init__(self, api_key: str, secret_key: str, passphrase: str,
                  json_file: str = "okx_transfers.json", is_demo: bool = False):
         """
@@ -42,79 +80,106 @@ class OKXMonitor:
         self.secret_key = secret_key
         self.passphrase = passphrase
         self.json_file = json_file
+        self.lock_file = json_file + '.lock'
+
+        # 预先完成HMAC密钥初始化，每次签名只需copy()
+        self._okx_hmac_template = hmac.new(
+            secret_key.encode('utf-8'),
+            digestmod=hashlib.sha256
+        )
 
         # API地址
         self.base_url = "https://www.okx.com" if not is_demo else "https://www.okx.com"
+        self._bills_url = self.base_url + self.BILLS_PATH
+
+        # 固定的请求头，每次请求只需补充签名和时间戳
+        self._okx_static_headers = {
+            'OK-ACCESS-KEY': api_key,
+            'OK-ACCESS-PASSPHRASE': passphrase,
+            'Content-Type': 'application/json'
+        }
+
+        # 复用HTTP连接（keep-alive），避免每次轮询都重新TLS握手
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        self.session.mount('https://', HTTPAdapter(max_retries=retry))
+
+        # 上次保存的记录及对应的文件状态，避免每轮都重新解析JSON文件
+        self._cached_transfers: List[Dict] = []
+        self._cached_stat = None
+
+        # WebSocket推送到达时唤醒监控循环，立即查询账单
+        self._wakeup = threading.Event()
 
         # 2小时的时间窗口（秒）
         self.time_window = 2 * 60 * 60
 
     def _generate_signature(self, timestamp: str, method: str, request_path: str, body: str = '') -> str:
         """生成OKX API签名"""
-        message = timestamp + method + request_path + body
-        mac = hmac.new(
-            bytes(self.secret_key, encoding='utf8'),
-            bytes(message, encoding='utf-8'),
-            digestmod=hashlib.sha256
-        )
+        mac = self._okx_hmac_template.copy()
+        mac.update((timestamp + method + request_path + body).encode('utf-8'))
         return base64.b64encode(mac.digest()).decode()
 
     def _get_okx_bills(self) -> List[Dict]:
         """获取OKX账单流水"""
         try:
             timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-            request_path = '/api/v5/account/bills?instType=&type=1'
-            method = 'GET'
-
-            signature = self._generate_signature(timestamp, method, request_path)
+            signature = self._generate_signature(timestamp, 'GET', self.BILLS_PATH)
 
             headers = {
-                'OK-ACCESS-KEY': self.api_key,
+                **self._okx_static_headers,
                 'OK-ACCESS-SIGN': signature,
                 'OK-ACCESS-TIMESTAMP': timestamp,
-                'OK-ACCESS-PASSPHRASE': self.passphrase,
-                'Content-Type': 'application/json'
             }
 
-            response = requests.get(
-                self.base_url + request_path,
+            response = self.session.get(
+                self._bills_url,
                 headers=headers,
                 timeout=10
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data.get('code') == '0':
                     return data.get('data', [])
                 else:
-                    print(f"✗ OKX API错误: {data.get('msg', 'Unknown error')}")
+                    logger.error("✗ OKX API错误: %s", data.get('msg', 'Unknown error'))
             else:
-                print(f"✗ HTTP错误: {response.status_code}")
+                logger.error("✗ HTTP错误: %s", response.status_code)
 
             return []
 
         except Exception as e:
-            print(f"✗ 获取OKX账单失败: {str(e)}")
+            logger.error("✗ 获取OKX账单失败: %s", e)
             return []
 
+    def _file_stat_key(self) -> tuple:
+        """JSON文件的修改时间和大小，用于判断文件是否被改写"""
+        st = os.stat(self.json_file)
+        return st.st_mtime_ns, st.st_size
+
     def _load_json_data(self) -> List[Dict]:
         """从JSON文件加载数据"""
         try:
             if os.path.exists(self.json_file):
+                # 文件自上次保存后未被改写（如其他监控实例），直接复用内存中的记录
+                if self._file_stat_key() == self._cached_stat:
+                    return self._cached_transfers
+
                 with open(self.json_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                     return data.get('transfers', [])
             return []
         except Exception as e:
-            print(f"✗ 加载JSON文件失败: {str(e)}")
+            logger.error("✗ 加载JSON文件失败: %s", e)
             return []
 
-    def _save_json_data(self, transfers: List[Dict]):
+    def _save_json_data(self, transfers: List[Dict], now: int, now_str: str):
         """保存数据到JSON文件"""
         try:
             data = {
-                'last_update': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'last_update_timestamp': int(time.time()),
+                'last_update': now_str,
+                'last_update_timestamp': now,
                 'transfers': transfers,
                 'count': len(transfers)
             }
@@ -122,53 +187,59 @@ class OKXMonitor:
             with open(self.json_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
 
-            print(f"✓ 数据已保存: {len(transfers)} 条记录")
+            self._cached_transfers = transfers
+            self._cached_stat = self._file_stat_key()
+
+            logger.info("✓ 数据已保存: %d 条记录", len(transfers))
 
         except Exception as e:
-            print(f"✗ 保存JSON文件失败: {str(e)}")
+            logger.error("✗ 保存JSON文件失败: %s", e)
 
-    def _filter_old_records(self, transfers: List[Dict]) -> List[Dict]:
+    def _filter_old_records(self, transfers: List[Dict], now: int) -> List[Dict]:
         """过滤掉超过2小时的记录"""
-        current_time = int(time.time())
-        cutoff_time = current_time - self.time_window
+        # bill_timestamp是毫秒，截止时间换算成毫秒后直接比较
+        cutoff_ms = (now - self.time_window) * 1000
 
         filtered = [
             t for t in transfers
-            if t.get('bill_timestamp', 0) / 1000 >= cutoff_time  # bill_timestamp是毫秒，需要转换为秒
+            if t.get('bill_timestamp', 0) >= cutoff_ms
         ]
 
         removed_count = len(transfers) - len(filtered)
         if removed_count > 0:
-            print(f"🗑️  已过滤 {removed_count} 条过期记录（超过2小时）")
+            logger.info("🗑️  已过滤 %d 条过期记录（超过2小时）", removed_count)
 
         return filtered
 
-    def _process_bills(self, bills: List[Dict]) -> List[Dict]:
-        """处理账单，转换为标准格式"""
+    def _process_bills(self, bills: List[Dict], now: int, now_str: str,
+                       known_bill_ids: Set[str] = frozenset()) -> List[Dict]:
+        """处理账单，转换为标准格式（已保存的账单直接跳过）"""
         transfers = []
 
         for bill in bills:
             # 只处理转入（type=1, balChg>0）
-            if bill.get('type') == '1' and float(bill.get('balChg', 0)) > 0:
+            if bill.get('type') != '1' or bill.get('billId') in known_bill_ids:
+                continue
+
+            # 每条账单只解析一次金额（Decimal精确解析，避免浮点误差）
+            bal_chg = Decimal(bill.get('balChg', '0'))
+            if bal_chg > 0:
                 # OKX时间戳是UTC时间（毫秒）
                 bill_timestamp_ms = int(bill['ts'])
                 bill_time = datetime.fromtimestamp(bill_timestamp_ms / 1000, tz=timezone.utc)
 
-                # 监控时间戳（当前时间，秒）
-                monitor_timestamp = int(time.time())
-                monitor_time = datetime.now()
-
                 transfer = {
                     'bill_id': bill['billId'],
-                    'amount': abs(float(bill['balChg'])),
+                    'amount': float(bal_chg),
+                    'amount_u8': int((bal_chg * self.AMOUNT_SCALE).to_integral_value()),
                     'currency': bill['ccy'],
                     'balance': float(bill['bal']),
                     'transfer_type': '转入',
                     'bill_timestamp': bill_timestamp_ms,
                     'bill_time': bill_time.strftime('%Y-%m-%d %H:%M:%S'),
                     'bill_time_utc': bill_time.isoformat(),
-                    'monitor_timestamp': monitor_timestamp,
-                    'monitor_time': monitor_time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'monitor_timestamp': now,
+                    'monitor_time': now_str,
                 }
 
                 transfers.append(transfer)
@@ -177,74 +248,168 @@ class OKXMonitor:
 
     def update_records(self):
         """更新转账记录"""
-        print("-" * 80)
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始更新...")
+        logger.info("-" * 80)
+        logger.info("开始更新...")
 
         # 1. 获取OKX账单
         bills = self._get_okx_bills()
         if not bills:
-            print("⚠️  未获取到新账单")
+            logger.warning("⚠️  未获取到新账单")
             return
 
-        print(f"✓ 获取到 {len(bills)} 条账单记录")
+        logger.info("✓ 获取到 %d 条账单记录", len(bills))
+
+        # 多个监控实例共用同一JSON文件时，已有实例在写入则跳过本轮
+        with open(self.lock_file, 'w') as lock_fp:
+            try:
+                fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("ℹ️  其他监控实例正在更新，跳过本轮")
+                return
+
+            self._merge_records(bills)
+
+    def _merge_records(self, bills: List[Dict]):
+        """合并新账单到JSON文件（需持有文件锁）"""
+        # 本轮统一的当前时间（秒级时间戳及本地时间字符串），供处理、过滤、保存复用
+        now = int(time.time())
+        now_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
 
         # 2. 加载现有数据
         existing_transfers = self._load_json_data()
         existing_bill_ids = {t['bill_id'] for t in existing_transfers}
 
         # 3. 处理新账单
-        new_transfers = self._process_bills(bills)
+        new_transfers = self._process_bills(bills, now, now_str, existing_bill_ids)
 
         # 4. 合并数据（去重）
         merged_transfers = existing_transfers.copy()
-        new_count = 0
+        new_lines = []
 
         for transfer in new_transfers:
             if transfer['bill_id'] not in existing_bill_ids:
                 merged_transfers.append(transfer)
                 existing_bill_ids.add(transfer['bill_id'])
-                new_count += 1
 
-                print(f"✓ 新转账: {transfer['amount']} {transfer['currency']} - {transfer['bill_time']}")
+                new_lines.append(f"✓ 新转账: {transfer['amount']} {transfer['currency']} - {transfer['bill_time']}")
 
-        if new_count == 0:
-            print("ℹ️  没有新的转账记录")
+        # 合并为一条日志，避免突发转账时逐条输出
+        if not new_lines:
+            logger.info("ℹ️  没有新的转账记录")
         else:
-            print(f"✓ 新增 {new_count} 条转账记录")
+            new_lines.append(f"✓ 新增 {len(new_lines)} 条转账记录")
+            logger.info('\n'.join(new_lines))
 
         # 5. 过滤过期记录
-        merged_transfers = self._filter_old_records(merged_transfers)
+        merged_transfers = self._filter_old_records(merged_transfers, now)
 
         # 6. 按时间排序（最新的在前）
         merged_transfers.sort(key=lambda x: x['monitor_timestamp'], reverse=True)
 
         # 7. 保存到JSON
-        self._save_json_data(merged_transfers)
+        self._save_json_data(merged_transfers, now, now_str)
 
-        print(f"✓ 当前共 {len(merged_transfers)} 条有效记录（近2小时）")
+        logger.info("✓ 当前共 %d 条有效记录（近2小时）", len(merged_transfers))
+
+    def start_websocket(self) -> bool:
+        """启动WebSocket监听线程（需要安装 websocket-client）"""
+        try:
+            import websocket
+        except ImportError:
+            logger.warning("⚠️  未安装 websocket-client，仅使用定时轮询")
+            return False
+
+        thread = threading.Thread(target=self._ws_loop, args=(websocket,), daemon=True)
+        thread.start()
+        return True
+
+    def _ws_loop(self, websocket):
+        """订阅账户频道，收到余额变动后唤醒监控循环"""
+        while True:
+            ws = None
+            try:
+                ws = websocket.create_connection(self.WS_PRIVATE_URL, timeout=25)
+
+                # 1. 登录（签名与REST接口相同，时间戳为秒）
+                timestamp = str(int(time.time()))
+                ws.send(orjson.dumps({
+                    'op': 'login',
+                    'args': [{
+                        'apiKey': self.api_key,
+                        'passphrase': self.passphrase,
+                        'timestamp': timestamp,
+                        'sign': self._generate_signature(timestamp, 'GET', '/users/self/verify'),
+                    }]
+                }).decode())
+
+                login = orjson.loads(ws.recv())
+                if login.get('event') != 'login' or login.get('code') != '0':
+                    raise RuntimeError(f"登录失败: {login.get('msg', login)}")
+
+                # 2. 订阅账户频道
+                # updateInterval=0：只在账户变动时推送，不推送定时快照
+                ws.send(orjson.dumps({'op': 'subscribe', 'args': [{
+                    'channel': 'account',
+                    'extraParams': '{"updateInterval": "0"}'
+                }]}).decode())
+
+                subscribe = orjson.loads(ws.recv())
+                if subscribe.get('event') != 'subscribe':
+                    raise RuntimeError(f"订阅失败: {subscribe.get('msg', subscribe)}")
+                logger.info("✓ WebSocket已订阅账户推送")
+
+                # 3. 接收推送，空闲时发送ping保活
+                while True:
+                    try:
+                        message = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        ws.send('ping')
+                        continue
+
+                    if message == 'pong':
+                        continue
+
+                    data = orjson.loads(message)
+                    if data.get('event') == 'error':
+                        raise RuntimeError(f"推送异常: {data.get('msg', data)}")
+
+                    if data.get('arg', {}).get('channel') == 'account' and data.get('data'):
+                        self._wakeup.set()
+
+            except Exception as e:
+                logger.error("✗ WebSocket连接异常: %s，5秒后重连", e)
+            finally:
+                if ws is not None:
+                    ws.close()
+
+            time.sleep(5)
 
     def monitor_loop(self, interval: int = 10):
         """监控循环"""
-        print("=" * 80)
-        print("OKX 转账监控系统 - JSON版本")
-        print("=" * 80)
-        print(f"监控间隔: {interval}秒")
-        print(f"数据文件: {self.json_file}")
-        print(f"时间窗口: 2小时")
-        print("-" * 80)
+        logger.info("=" * 80)
+        logger.info("OKX 转账监控系统 - JSON版本")
+        logger.info("=" * 80)
+        logger.info("监控间隔: %d秒", interval)
+        logger.info("数据文件: %s", self.json_file)
+        logger.info("时间窗口: 2小时")
+        logger.info("-" * 80)
 
         while True:
             try:
                 self.update_records()
             except Exception as e:
-                print(f"✗ 监控循环异常: {str(e)}")
+                logger.error("✗ 监控循环异常: %s", e)
 
-            print(f"💤 等待 {interval} 秒...")
-            time.sleep(interval)
+            logger.info("💤 等待 %d 秒...", interval)
+            if self._wakeup.wait(interval):
+                logger.info("🔔 收到账户推送，立即更新")
+            self._wakeup.clear()
 
 
 def main():
     """主函数"""
+    setup_logging()
+
     print("=" * 80)
     print("OKX 转账监控系统启动")
     print("=" * 80)
@@ -264,7 +429,8 @@ def main():
             },
             "monitor": {
                 "interval": 10,
-                "json_file": "okx_transfers.json"
+                "json_file": "okx_transfers.json",
+                "websocket": False
             }
         }, indent=2, ensure_ascii=False))
         return
@@ -295,6 +461,10 @@ def main():
         is_demo=okx_config.get('is_demo', False)
     )
 
+    # 启动WebSocket推送（可选），定时轮询作为兜底
+    if monitor_config.get('websocket', False):
+        monitor.start_websocket()
+
     # 启动监控
     interval = monitor_config.get('interval', 10)
     monitor.monitor_loop(interval)
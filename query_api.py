@@ -8,25 +8,84 @@ OKX 转账记录查询API - 带签名验证
 3. 只返回近2小时的有效记录
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN
 import hmac
-import hashlib
 import json
+import atexit
+import hashlib
+import logging
+import logging.handlers
+import orjson
 import os
+import queue
+import sys
+import threading
 import time
-from datetime import datetime
 
 app = Flask(__name__)
+logger = logging.getLogger('okx_query_api')
+
+# 整数金额的精度（1e-8），与监控服务写入的 amount_u8 一致
+AMOUNT_SCALE = 10 ** 8
+
+# 金额筛选参数：(参数名, 换算整数时的取整方式, 格式错误提示)
+AMOUNT_FILTERS = (
+    ('amount', ROUND_HALF_EVEN, '金额格式错误'),
+    ('min_amount', ROUND_CEILING, '最小金额格式错误'),
+    ('max_amount', ROUND_FLOOR, '最大金额格式错误'),
+)
 
 # 全局配置
 CONFIG = {}
 JSON_FILE = "okx_transfers.json"
 API_SECRET = ""
+_API_SECRET_BYTES = b""
+_HMAC_TEMPLATE = None
+_SIGN_SUFFIX = b""
+# 签名算法：sha256（HMAC-SHA256，默认）或 blake2b（带密钥的BLAKE2b，32字节摘要）
+SIGN_ALG = "sha256"
+
+# 已验证通过的签名缓存：签名内容 -> (签名, 首次验证时间)，按验证顺序淘汰
+# 两个接口均为只读查询，相同请求的重发（客户端重试、重复提交）直接命中缓存，无需再计算签名
+VERIFIED_SIGNATURES_MAX = 8192
+_VERIFIED_SIGNATURES = OrderedDict()
+_VERIFIED_LOCK = threading.Lock()
+
+# JSON文件解析缓存：((st_mtime_ns, st_size), 结果)，文件未变化时直接复用
+_JSON_CACHE = (None, None)
+_JSON_CACHE_LOCK = threading.Lock()
+# inotify监听线程运行时由其负责刷新缓存，请求处理无需每次stat
+_JSON_WATCHED = False
+
+
+def setup_logging():
+    """配置日志：请求线程只把日志放入队列，由后台线程写入stdout"""
+    log_queue = queue.SimpleQueue()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('[%(asctime)s] %(message)s', '%Y-%m-%d %H:%M:%S'))
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def json_response(payload: dict):
+    """使用orjson序列化JSON响应"""
+    return app.response_class(orjson.dumps(payload), mimetype='application/json')
 
 
 def load_config():
     """加载配置文件"""
-    global CONFIG, JSON_FILE, API_SECRET
+    global CONFIG, JSON_FILE, API_SECRET, _API_SECRET_BYTES, _HMAC_TEMPLATE, _SIGN_SUFFIX, SIGN_ALG
 
     config_file = 'config.json'
 
@@ -40,11 +99,26 @@ def load_config():
 
         JSON_FILE = CONFIG.get('monitor', {}).get('json_file', 'okx_transfers.json')
         API_SECRET = CONFIG.get('query_api', {}).get('secret', '')
+        SIGN_ALG = CONFIG.get('query_api', {}).get('alg', 'sha256')
 
         if not API_SECRET:
             print("✗ 配置文件中缺少 query_api.secret")
             return False
 
+        _API_SECRET_BYTES = API_SECRET.encode('utf-8')
+
+        if SIGN_ALG not in ('sha256', 'blake2b'):
+            print(f"✗ 不支持的签名算法: {SIGN_ALG}（可选 sha256 / blake2b）")
+            return False
+
+        if SIGN_ALG == 'blake2b' and len(_API_SECRET_BYTES) > 64:
+            print("✗ blake2b 签名要求 query_api.secret 不超过64字节")
+            return False
+
+        # 预先完成HMAC密钥初始化，每次验签只需copy()
+        _HMAC_TEMPLATE = hmac.new(_API_SECRET_BYTES, None, 'sha256')
+        _SIGN_SUFFIX = b'&secret=' + _API_SECRET_BYTES
+
         print("✓ 配置文件加载成功")
         return True
 
@@ -53,6 +127,18 @@ def load_config():
         return False
 
 
+def _remember_signature(message: bytes, signature: str, current_time: int):
+    """记录已验证通过的签名"""
+    with _VERIFIED_LOCK:
+        _VERIFIED_SIGNATURES.setdefault(message, (signature, current_time))
+
+        # 淘汰超出数量上限或时间戳已过期的记录（时间戳有效期前后各30分钟）
+        while _VERIFIED_SIGNATURES and (
+                len(_VERIFIED_SIGNATURES) > VERIFIED_SIGNATURES_MAX or
+                next(iter(_VERIFIED_SIGNATURES.values()))[1] < current_time - 3600):
+            _VERIFIED_SIGNATURES.popitem(last=False)
+
+
 def verify_signature(params: dict, signature: str, timestamp: str) -> bool:
     """
     验证请求签名
@@ -71,39 +157,58 @@ def verify_signature(params: dict, signature: str, timestamp: str) -> bool:
         request_time = int(timestamp)
 
         if abs(current_time - request_time) > 1800:
-            print(f"⚠️  请求已过期: 当前时间={current_time}, 请求时间={request_time}")
+            logger.warning("⚠️  请求已过期: 当前时间=%d, 请求时间=%d", current_time, request_time)
             return False
 
         # 2. 生成签名字符串（参数按字母排序）
-        sorted_params = sorted(params.items())
-        param_str = '&'.join([f"{k}={v}" for k, v in sorted_params])
-        sign_str = f"{param_str}&timestamp={timestamp}&secret={API_SECRET}"
-
-        # 3. 计算HMAC-SHA256签名
-        expected_signature = hmac.new(
-            bytes(API_SECRET, encoding='utf8'),
-            bytes(sign_str, encoding='utf-8'),
-            digestmod=hashlib.sha256
-        ).hexdigest()
-
-        # 4. 比对签名
-        if signature != expected_signature:
-            print(f"⚠️  签名验证失败")
-            print(f"   预期: {expected_signature}")
-            print(f"   实际: {signature}")
+        #    固定的 "&secret=..." 后缀已在加载配置时编码好
+        param_str = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
+        message = f"{param_str}&timestamp={timestamp}".encode('utf-8')
+
+        # 3. 相同请求已验证过时直接比对缓存的签名，无需再计算
+        cached = _VERIFIED_SIGNATURES.get(message)
+        if cached is not None:
+            return hmac.compare_digest(signature.encode('utf-8'), cached[0].encode('utf-8'))
+
+        sign_bytes = message + _SIGN_SUFFIX
+
+        # 4. 计算签名
+        if SIGN_ALG == 'blake2b':
+            expected_signature = hashlib.blake2b(
+                sign_bytes, key=_API_SECRET_BYTES, digest_size=32
+            ).hexdigest()
+        else:
+            mac = _HMAC_TEMPLATE.copy()
+            mac.update(sign_bytes)
+            expected_signature = mac.hexdigest()
+
+        # 5. 比对签名（常量时间比较，防时序攻击）
+        if not hmac.compare_digest(signature.encode('utf-8'), expected_signature.encode('utf-8')):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("签名验证失败: 预期=%s, 实际=%s", expected_signature, signature)
             return False
 
+        # 6. 缓存验证通过的签名，供相同请求的重发复用
+        _remember_signature(message, expected_signature, current_time)
         return True
 
     except Exception as e:
-        print(f"✗ 签名验证异常: {str(e)}")
+        logger.error("✗ 签名验证异常: %s", e)
         return False
 
 
 def load_transfers_from_json() -> dict:
-    """从JSON文件加载转账记录"""
+    """从JSON文件加载转账记录（文件未变化时返回缓存，调用方不得修改返回值）"""
+    global _JSON_CACHE
+
+    cached_key, cached_result = _JSON_CACHE
+    if _JSON_WATCHED and cached_result is not None:
+        return cached_result
+
     try:
-        if not os.path.exists(JSON_FILE):
+        try:
+            st = os.stat(JSON_FILE)
+        except FileNotFoundError:
             return {
                 'success': False,
                 'message': 'JSON文件不存在，请先启动监控服务',
@@ -111,16 +216,55 @@ def load_transfers_from_json() -> dict:
                 'count': 0
             }
 
-        with open(JSON_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        cache_key = (st.st_mtime_ns, st.st_size)
+        cached_key, cached_result = _JSON_CACHE
+        if cached_key == cache_key:
+            return cached_result
+
+        with _JSON_CACHE_LOCK:
+            # 等锁期间其他线程可能已完成解析
+            cached_key, cached_result = _JSON_CACHE
+            if cached_key == cache_key:
+                return cached_result
+
+            with open(JSON_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+
+            transfers = data.get('transfers', [])
+
+            # 整数金额（× 10^8），旧记录没有 amount_u8 时由浮点金额换算
+            units = [
+                t['amount_u8'] if 'amount_u8' in t else round(t['amount'] * AMOUNT_SCALE)
+                for t in transfers
+            ]
+
+            # (币种, 整数金额) -> 转账记录，记录按时间倒序，保留最新的一条
+            index = {}
+            # 币种 -> 该币种记录的下标（按金额排序）
+            positions_by_currency = {}
+            for i, t in enumerate(transfers):
+                index.setdefault((t['currency'], units[i]), t)
+                positions_by_currency.setdefault(t['currency'], []).append(i)
+
+            # 币种 -> (升序整数金额数组, 对应下标)，供范围查询二分使用
+            amount_ranges = {}
+            for ccy, positions in positions_by_currency.items():
+                positions.sort(key=units.__getitem__)
+                amount_ranges[ccy] = (array('q', (units[i] for i in positions)), positions)
+
+            result = {
+                'success': True,
+                'last_update': data.get('last_update', ''),
+                'last_update_timestamp': data.get('last_update_timestamp', 0),
+                'transfers': transfers,
+                'count': data.get('count', 0),
+                'units': units,
+                'index': index,
+                'amount_ranges': amount_ranges
+            }
+            _JSON_CACHE = (cache_key, result)
 
-        return {
-            'success': True,
-            'last_update': data.get('last_update', ''),
-            'last_update_timestamp': data.get('last_update_timestamp', 0),
-            'transfers': data.get('transfers', []),
-            'count': data.get('count', 0)
-        }
+        return result
 
     except Exception as e:
         return {
@@ -131,6 +275,139 @@ def load_transfers_from_json() -> dict:
         }
 
 
+def to_amount_units(value, rounding=ROUND_HALF_EVEN) -> int:
+    """金额转换为整数单位（× 10^8），格式错误时抛出ValueError"""
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"金额格式错误: {value}")
+
+    # 拒绝NaN/Infinity及超大数值（避免换算出超长整数）
+    if not amount.is_finite() or amount.adjusted() > 18:
+        raise ValueError(f"金额格式错误: {value}")
+
+    return int((amount * AMOUNT_SCALE).to_integral_value(rounding))
+
+
+def parse_amount_filters(params: dict) -> tuple:
+    """
+    一次性解析金额筛选参数
+
+    Returns:
+        tuple: (amount, min_amount, max_amount) 整数单位，未提供的为None
+
+    Raises:
+        ValueError: 参数格式错误，异常信息为返回给客户端的提示
+    """
+    values = []
+
+    # 精确金额四舍五入，最小金额向上取整，最大金额向下取整
+    for name, rounding, message in AMOUNT_FILTERS:
+        if name not in params:
+            values.append(None)
+            continue
+
+        try:
+            values.append(to_amount_units(params[name], rounding))
+        except ValueError:
+            raise ValueError(message)
+
+    return tuple(values)
+
+
+def get_request_params() -> dict:
+    """读取请求参数：POST读取JSON请求体，GET读取URL参数"""
+    if request.method == 'POST':
+        # silent=True：请求体缺失或格式错误时返回None，不抛出异常
+        data = request.get_json(silent=True)
+        return data if isinstance(data, dict) else {}
+
+    # 签名覆盖客户端提交的全部参数，因此保留完整参数字典
+    return request.args.to_dict()
+
+
+def start_json_watcher() -> bool:
+    """
+    启动inotify监听线程（需要安装 inotify_simple，仅Linux）
+
+    JSON文件写入完成、被替换、移走或删除时立即重新解析，请求处理直接返回缓存。
+    未安装 inotify_simple 或无法添加监听时返回False，继续使用每次请求stat的方式。
+    """
+    global _JSON_WATCHED
+
+    try:
+        import inotify_simple
+    except ImportError:
+        return False
+
+    inotify = None
+    try:
+        inotify = inotify_simple.INotify()
+        flags = inotify_simple.flags
+        inotify.add_watch(
+            os.path.dirname(os.path.abspath(JSON_FILE)),
+            flags.CLOSE_WRITE | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE | flags.DELETE_SELF
+        )
+    except OSError as e:
+        if inotify is not None:
+            inotify.close()
+        logger.error("✗ 无法启用inotify监听，继续按文件状态检查: %s", e)
+        return False
+
+    # 监听已生效后按文件状态校验一次缓存（如preload时主进程解析的结果），
+    # 文件未变化时继续沿用，之后的写入都会触发事件
+    load_transfers_from_json()
+    threading.Thread(target=_watch_json_file, args=(inotify, flags), daemon=True).start()
+    _JSON_WATCHED = True
+    logger.info("✓ 已启用inotify监听: %s", JSON_FILE)
+    return True
+
+
+def _watch_json_file(inotify, flags):
+    """监听线程：目标文件变化时使缓存失效并重新解析"""
+    global _JSON_CACHE, _JSON_WATCHED
+
+    file_name = os.path.basename(JSON_FILE)
+    # 目录监听失效或事件队列溢出后无法得知文件是否变化
+    lost_mask = flags.IGNORED | flags.DELETE_SELF | flags.Q_OVERFLOW
+
+    try:
+        while True:
+            events = inotify.read()
+            if any(event.mask & lost_mask for event in events):
+                raise RuntimeError("目录监听失效或事件队列溢出")
+
+            if any(event.name == file_name for event in events):
+                _JSON_CACHE = (None, None)
+                load_transfers_from_json()
+    except Exception as e:
+        # 监听失败时退回每次请求stat的方式
+        _JSON_WATCHED = False
+        _JSON_CACHE = (None, None)
+        logger.error("✗ inotify监听异常，改为按文件状态检查: %s", e)
+    finally:
+        inotify.close()
+
+
+def _select_by_amount(result: dict, currency: str, amount=None, min_amount=None, max_amount=None) -> list:
+    """在指定币种的升序整数金额数组上二分查找符合条件的记录，结果保持原有时间顺序"""
+    amounts, positions = result['amount_ranges'].get(currency, ((), []))
+    lo, hi = 0, len(amounts)
+
+    if amount is not None:
+        lo = max(lo, bisect_left(amounts, amount))
+        hi = min(hi, bisect_right(amounts, amount))
+
+    if min_amount is not None:
+        lo = max(lo, bisect_left(amounts, min_amount))
+
+    if max_amount is not None:
+        hi = min(hi, bisect_right(amounts, max_amount))
+
+    transfers = result['transfers']
+    return [transfers[i] for i in sorted(positions[lo:hi])]
+
+
 @app.route('/api/query', methods=['GET', 'POST'])
 def query_transfers():
     """
@@ -156,24 +433,21 @@ def query_transfers():
     """
     try:
         # 获取参数
-        if request.method == 'POST':
-            params = request.json or {}
-        else:
-            params = request.args.to_dict()
+        params = get_request_params()
 
         # 提取签名和时间戳
         signature = params.pop('signature', '')
         timestamp = params.pop('timestamp', '')
 
         if not signature or not timestamp:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'message': '缺少签名或时间戳参数'
             }), 400
 
         # 验证签名
         if not verify_signature(params, signature, timestamp):
-            return jsonify({
+            return json_response({
                 'success': False,
                 'message': '签名验证失败'
             }), 403
@@ -182,45 +456,35 @@ def query_transfers():
         result = load_transfers_from_json()
 
         if not result['success']:
-            return jsonify(result), 500
+            return json_response(result), 500
+
+        # 解析金额条件
+        try:
+            amount, min_amount, max_amount = parse_amount_filters(params)
+        except ValueError as e:
+            return json_response({'success': False, 'message': str(e)}), 400
 
         # 筛选记录
         transfers = result['transfers']
 
-        # 按金额筛选
-        if 'amount' in params:
-            try:
-                amount = float(params['amount'])
-                transfers = [t for t in transfers if abs(t['amount'] - amount) < 0.00000001]
-            except ValueError:
-                return jsonify({'success': False, 'message': '金额格式错误'}), 400
-
-        # 按币种筛选
         if 'currency' in params:
+            # 指定币种时，在该币种按金额排序的数组上二分查找
             currency = params['currency'].upper()
-            transfers = [t for t in transfers if t['currency'] == currency]
-
-        # 按最小金额筛选
-        if 'min_amount' in params:
-            try:
-                min_amount = float(params['min_amount'])
-                transfers = [t for t in transfers if t['amount'] >= min_amount]
-            except ValueError:
-                return jsonify({'success': False, 'message': '最小金额格式错误'}), 400
-
-        # 按最大金额筛选
-        if 'max_amount' in params:
-            try:
-                max_amount = float(params['max_amount'])
-                transfers = [t for t in transfers if t['amount'] <= max_amount]
-            except ValueError:
-                return jsonify({'success': False, 'message': '最大金额格式错误'}), 400
+            transfers = _select_by_amount(result, currency, amount, min_amount, max_amount)
+        elif amount is not None or min_amount is not None or max_amount is not None:
+            # 未指定币种时，一次遍历同时应用全部金额条件
+            transfers = [
+                t for t, u in zip(transfers, result['units'])
+                if (amount is None or u == amount) and
+                   (min_amount is None or u >= min_amount) and
+                   (max_amount is None or u <= max_amount)
+            ]
 
         # 记录查询日志
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 查询请求: {params} -> {len(transfers)} 条记录")
+        logger.info("查询请求: %s -> %d 条记录", params, len(transfers))
 
         # 返回结果
-        return jsonify({
+        return json_response({
             'success': True,
             'data': {
                 'last_update': result['last_update'],
@@ -232,8 +496,8 @@ def query_transfers():
         }), 200
 
     except Exception as e:
-        print(f"✗ 查询异常: {str(e)}")
-        return jsonify({
+        logger.error("✗ 查询异常: %s", e)
+        return json_response({
             'success': False,
             'message': f'查询失败: {str(e)}'
         }), 500
@@ -261,28 +525,28 @@ def check_payment():
     """
     try:
         # 获取参数
-        params = request.args.to_dict()
+        params = get_request_params()
 
         # 提取签名和时间戳
         signature = params.pop('signature', '')
         timestamp = params.pop('timestamp', '')
 
         if not signature or not timestamp:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'message': '缺少签名或时间戳参数'
             }), 400
 
         # 验证必需参数
         if 'amount' not in params:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'message': '缺少金额参数'
             }), 400
 
         # 验证签名
         if not verify_signature(params, signature, timestamp):
-            return jsonify({
+            return json_response({
                 'success': False,
                 'message': '签名验证失败'
             }), 403
@@ -291,31 +555,30 @@ def check_payment():
         result = load_transfers_from_json()
 
         if not result['success']:
-            return jsonify(result), 500
+            return json_response(result), 500
 
         # 查找匹配的转账
         try:
-            amount = float(params['amount'])
+            amount = params['amount']
             currency = params.get('currency', 'USDT').upper()
 
-            for transfer in result['transfers']:
-                if (abs(transfer['amount'] - amount) < 0.00000001 and
-                    transfer['currency'] == currency):
-                    # 找到匹配
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 支付检查: {amount} {currency} -> 已找到")
+            transfer = result['index'].get((currency, to_amount_units(amount)))
+            if transfer is not None:
+                # 找到匹配
+                logger.info("支付检查: %s %s -> 已找到", amount, currency)
 
-                    return jsonify({
-                        'success': True,
-                        'data': {
-                            'found': True,
-                            'transfer': transfer
-                        }
-                    }), 200
+                return json_response({
+                    'success': True,
+                    'data': {
+                        'found': True,
+                        'transfer': transfer
+                    }
+                }), 200
 
             # 未找到
-            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 支付检查: {amount} {currency} -> 未找到")
+            logger.info("支付检查: %s %s -> 未找到", amount, currency)
 
-            return jsonify({
+            return json_response({
                 'success': True,
                 'data': {
                     'found': False,
@@ -324,11 +587,11 @@ def check_payment():
             }), 200
 
         except ValueError:
-            return jsonify({'success': False, 'message': '金额格式错误'}), 400
+            return json_response({'success': False, 'message': '金额格式错误'}), 400
 
     except Exception as e:
-        print(f"✗ 检查异常: {str(e)}")
-        return jsonify({
+        logger.error("✗ 检查异常: %s", e)
+        return json_response({
             'success': False,
             'message': f'检查失败: {str(e)}'
         }), 500
@@ -337,7 +600,7 @@ def check_payment():
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查"""
-    return jsonify({
+    return json_response({
         'status': 'ok',
         'service': 'okx-query-api',
         'timestamp': int(time.time())
@@ -346,6 +609,8 @@ def health_check():
 
 def main():
     """主函数"""
+    setup_logging()
+
     print("=" * 80)
     print("OKX 转账记录查询API")
     print("=" * 80)
@@ -354,6 +619,8 @@ def main():
     if not load_config():
         return
 
+    start_json_watcher()
+
     # 获取API配置
     api_config = CONFIG.get('query_api', {})
     host = api_config.get('host', '0.0.0.0')
@@ -23,6 +23,7 @@ echo "正在停止旧服务..."
 pkill -f payment_monitor.py 2>/dev/null
 pkill -f okx_monitor.py 2>/dev/null
 pkill -f query_api.py 2>/dev/null
+pkill -f "wsgi:app" 2>/dev/null
 sleep 2
 echo "✓ 旧服务已停止"
 
@@ -36,9 +37,14 @@ echo "✓ 监控服务已启动 (PID: $MONITOR_PID)"
 # 等待1秒
 sleep 1
 
-# 启动查询API
+# 启动查询API（已安装gunicorn时使用多进程模式）
 echo "启动查询API服务..."
-nohup python3 query_api.py > query_api.log 2>&1 &
+if command -v gunicorn > /dev/null 2>&1; then
+    nohup gunicorn -c gunicorn_conf.py wsgi:app > query_api.log 2>&1 &
+else
+    echo "ℹ️  未安装gunicorn，使用Flask开发服务器"
+    nohup python3 query_api.py > query_api.log 2>&1 &
+fi
 API_PID=$!
 echo "✓ 查询API已启动 (PID: $API_PID)"
 
@@ -68,7 +74,7 @@ echo ""
 echo "========================================="
 echo "当前运行的Python进程"
 echo "========================================="
-ps aux | grep -E "okx_monitor|query_api" | grep -v grep
+ps aux | grep -E "okx_monitor|query_api|wsgi:app" | grep -v grep
 
 echo ""
 echo "========================================="
@@ -34,6 +34,19 @@ else
     echo "ℹ️  查询API未运行"
 fi
 
+# 停止gunicorn运行的查询API
+if pgrep -f "wsgi:app" > /dev/null; then
+    echo "正在停止查询API (gunicorn)..."
+    pkill -f "wsgi:app"
+    sleep 1
+
+    if pgrep -f "wsgi:app" > /dev/null; then
+        echo "⚠️  进程未停止，强制终止..."
+        pkill -9 -f "wsgi:app"
+    fi
+    echo "✓ 查询API (gunicorn) 已停止"
+fi
+
 # 停止旧版服务（如果还在运行）
 if pgrep -f "payment_monitor.py" > /dev/null; then
     echo "正在停止旧版监控服务..."
@@ -46,7 +59,7 @@ echo "========================================="
 echo "检查剩余进程"
 echo "========================================="
 
-REMAINING=$(ps aux | grep -E "okx_monitor|query_api|payment_monitor" | grep -v grep)
+REMAINING=$(ps aux | grep -E "okx_monitor|query_api|wsgi:app|payment_monitor" | grep -v grep)
 
 if [ -z "$REMAINING" ]; then
     echo "✓ 所有服务已停止"
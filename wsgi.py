@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OKX 转账记录查询API - WSGI入口
+供gunicorn等生产级WSGI服务器加载：
+    gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+from query_api import app, load_config, load_transfers_from_json
+
+if not load_config():
+    raise RuntimeError("配置文件加载失败，查询API无法启动")
+
+# 预先解析转账记录（配合gunicorn preload_app，worker继承已解析的缓存）
+load_transfers_from_json()